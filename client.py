@@ -1,16 +1,19 @@
 import argparse
 import asyncio
 import os
-import json
 import logging
 import shutil
+import sys
 from pathlib import Path
-from typing import List, Any
+from typing import List, Any, Set, Tuple
 
+import httpx
+import orjson
 from fastmcp import Client
 from fastmcp.client.auth.oauth import OAuth, ClientNotFoundError
 from key_value.aio.stores.disk import DiskStore
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from prompt_toolkit import PromptSession
 from dotenv import load_dotenv
 
 # Load OpenAI Key and Config
@@ -21,132 +24,335 @@ MCP_SERVER_URL = os.environ.get("MCP_SERVER_URL", "http://localhost:8000/sse")
 if not OPENAI_API_KEY:
     raise ValueError("OPENAI_API_KEY not found in.env")
 
-client_openai = AsyncOpenAI(api_key=OPENAI_API_KEY)
+# Transcript length at which older turns are summarized into a single message
+MAX_HISTORY = 40
+SUMMARY_MODEL = "gpt-4o-mini"
 
-async def convert_mcp_to_openai_tools(mcp_tools: List[Any]) -> List:
+# Shared HTTP/2 connection pool so chat turns reuse warm TCP/TLS connections
+# (the SDK's httpx subclass keeps its defaults, e.g. follow_redirects)
+http_client = DefaultAsyncHttpxClient(
+    http2=True,
+    # Keep idle connections long enough to survive the OAuth flow and the user typing;
+    # httpx would otherwise drop them after 5s
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=300.0),
+    timeout=httpx.Timeout(60.0, connect=10.0)
+)
+client_openai = AsyncOpenAI(api_key=OPENAI_API_KEY, http_client=http_client)
+
+def convert_mcp_to_openai_tools(mcp_tools: List[Any]) -> List:
     """Adapts MCP Tool schema to OpenAI Tool schema."""
-    openai_tools = []
-    for tool in mcp_tools:
-        openai_tools.append({
+    return [
+        {
             "type": "function",
             "function": {
                 "name": tool.name,
                 "description": tool.description,
                 "parameters": tool.inputSchema
             }
-        })
-    return openai_tools
+        }
+        for tool in mcp_tools
+    ]
+
+def get_direct_output_tools(mcp_tools: List[Any]) -> Set[str]:
+    """Names of tools the server marks as returning user-facing text (auto_summarize: False)."""
+    return {
+        tool.name for tool in mcp_tools
+        if (tool.meta or {}).get("auto_summarize") is False
+    }
+
+def format_tool_output(result: Any) -> Tuple[str, bool]:
+    """Turns a gathered tool call result into transcript text. The flag is False for errors."""
+    if isinstance(result, BaseException):
+        return f"Error: {str(result) or type(result).__name__}", False
+    try:
+        return str(result.content[0].text if result.content else "Success"), True
+    except Exception as e:
+        return f"Error: {str(e)}", False
+
+async def execute_tool_call(mcp_client: Client, name: str, arguments: str) -> Any:
+    """Parses the arguments of an OpenAI tool call and executes it on the MCP Server."""
+    args = orjson.loads(arguments)
+    return await mcp_client.call_tool(name, args)
+
+async def stream_chat_turn(mcp_client: Client, messages: List, openai_tools: List):
+    """
+    Streams a chat completion and starts each tool call on the MCP Server as soon
+    as its arguments are complete, overlapping the remaining decode with tool execution.
+    Returns the assistant text, the assembled tool calls and their pending tasks.
+    """
+    stream = await client_openai.chat.completions.create(
+        model="gpt-4o",
+        messages=messages,
+        tools=openai_tools,
+        tool_choice="auto",
+        stream=True
+    )
+
+    content_parts = []
+    tool_calls = {}
+    tasks = {}
+
+    def schedule(index: int):
+        if index in tasks:
+            return
+        function = tool_calls[index]["function"]
+        print(f" > Executing tool: {function['name']}...")
+        tasks[index] = asyncio.create_task(
+            execute_tool_call(mcp_client, function["name"], function["arguments"])
+        )
+
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            delta = choice.delta
+
+            if delta.content:
+                content_parts.append(delta.content)
+
+            for tc_delta in delta.tool_calls or []:
+                # Deltas arrive in index order, so a new index means earlier calls are complete
+                for index in list(tool_calls):
+                    if index < tc_delta.index:
+                        schedule(index)
+
+                entry = tool_calls.setdefault(tc_delta.index, {
+                    "id": None,
+                    "type": "function",
+                    "function": {"name": "", "arguments": ""}
+                })
+                if tc_delta.id:
+                    entry["id"] = tc_delta.id
+                if tc_delta.function:
+                    if tc_delta.function.name:
+                        entry["function"]["name"] += tc_delta.function.name
+                    if tc_delta.function.arguments:
+                        entry["function"]["arguments"] += tc_delta.function.arguments
+
+            if choice.finish_reason == "tool_calls":
+                for index in tool_calls:
+                    schedule(index)
+
+        # Guard against streams that end without a tool_calls finish reason
+        for index in tool_calls:
+            schedule(index)
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+
+    content = "".join(content_parts) or None
+    ordered = sorted(tool_calls)
+    return content, [tool_calls[i] for i in ordered], [tasks[i] for i in ordered]
+
+async def compact_history(messages: List) -> None:
+    """
+    Replaces the oldest half of the transcript with a short summary so the prompt
+    sent on every turn stays bounded instead of growing with the session.
+    """
+    # Cut on a user turn so assistant tool calls stay next to their tool results
+    cut = next(
+        (i for i in range(len(messages) // 2, len(messages)) if messages[i]["role"] == "user"),
+        None
+    )
+    if not cut:
+        return
+
+    transcript = "\n".join(
+        f"{m['role']}: {m.get('content') or ''}" for m in messages[:cut]
+    )
+    try:
+        summary = await client_openai.chat.completions.create(
+            model=SUMMARY_MODEL,
+            messages=[
+                {"role": "system", "content": "Summarize this conversation between a user and a calendar assistant. Keep any dates, times, event names and links."},
+                {"role": "user", "content": transcript}
+            ]
+        )
+    except Exception as e:
+        print(f"! History compaction failed: {e}")
+        return
+
+    messages[:cut] = [{
+        "role": "system",
+        "content": f"Summary of the earlier conversation: {summary.choices[0].message.content}"
+    }]
+
+def print_help() -> None:
+    """Prints the commands handled locally by the chat loop."""
+    print("Commands:")
+    print("  help        Show this message")
+    print("  clear       Start a new conversation")
+    print("  quit, exit  Leave the assistant")
+    print("Anything else is sent to the assistant.")
 
 async def run_chat_loop(profile: str = "default"):
     print(f"--- Connecting to MCP Server at {MCP_SERVER_URL} ---")
     print(f"--- Using profile: {profile} ---")
 
     storage_dir = Path(".client_storage") / profile
-    storage_dir.mkdir(parents=True, exist_ok=True)
+
+    # Warm up the OpenAI connection while the MCP handshake and OAuth flow run
+    warmup = asyncio.create_task(client_openai.models.retrieve("gpt-4o"))
     
-    max_retries = 2
-    for attempt in range(max_retries):
-        # We use a persistent DiskStore for auth tokens so we don't have to login every time
-        disk_store = DiskStore(directory=str(storage_dir))
-
-        try:
-            async with disk_store:
-                # Create OAuth provider with persistent storage
-                auth_provider = OAuth(
-                    mcp_url=MCP_SERVER_URL,
-                    token_storage=disk_store
-                )
+    try:
+        await asyncio.to_thread(storage_dir.mkdir, parents=True, exist_ok=True)
+
+        max_retries = 2
+        for attempt in range(max_retries):
+            # We use a persistent DiskStore for auth tokens so we don't have to login every time
+            disk_store = DiskStore(directory=str(storage_dir))
+
+            try:
+                async with disk_store:
+                    # Create OAuth provider with persistent storage
+                    auth_provider = OAuth(
+                        mcp_url=MCP_SERVER_URL,
+                        token_storage=disk_store
+                    )
                 
-                async with Client(MCP_SERVER_URL, auth=auth_provider) as mcp_client:
-                    print("✓ Connected to Server & Authenticated")
+                    async with Client(MCP_SERVER_URL, auth=auth_provider) as mcp_client:
+                        print("✓ Connected to Server & Authenticated")
                     
-                    mcp_tools = await mcp_client.list_tools()
-                    openai_tools = await convert_mcp_to_openai_tools(mcp_tools)
-                    print(f"✓ Discovered tools: {[t['function']['name'] for t in openai_tools]}")
+                        mcp_tools = await mcp_client.list_tools()
+                        openai_tools = convert_mcp_to_openai_tools(mcp_tools)
+                        print(f"✓ Discovered tools: {[t['function']['name'] for t in openai_tools]}")
+                        direct_tools = get_direct_output_tools(mcp_tools)
 
-                    messages = []
-                    print("\n--- GPT-4o Calendar Assistant (Type 'quit' to exit) ---")
+                        messages = []
+                        compaction = None
 
-                    while True:
-                        try:
-                            user_input = input("\nUser: ")
-                            if user_input.lower() in ['quit', 'exit']:
-                                return
-                            
-                            messages.append({"role": "user", "content": user_input})
+                        # A failed warm-up is not fatal, the first turn simply connects itself
+                        await asyncio.gather(warmup, return_exceptions=True)
+                        print("\n--- GPT-4o Calendar Assistant (Type 'help' for commands) ---")
+
+                        # Async prompt keeps background tasks running while waiting for input,
+                        # and raises KeyboardInterrupt/EOFError on Ctrl+C/Ctrl+D
+                        prompt_session = PromptSession()
+
+                        while True:
+                            try:
+                                user_input = await prompt_session.prompt_async("\nUser: ")
+                                command = user_input.strip().lower()
+                                if command in ['quit', 'exit']:
+                                    return
+
+                                # Handle local commands without an OpenAI round trip
+                                if not command:
+                                    continue
+                                if command == 'help':
+                                    print_help()
+                                    continue
+                                if command == 'clear':
+                                    if compaction:
+                                        compaction.cancel()
+                                        compaction = None
+                                    messages.clear()
+                                    print("✓ Conversation cleared")
+                                    continue
+
+                                # Let a pending history compaction land before the transcript grows
+                                if compaction:
+                                    await compaction
+                                    compaction = None
                             
-                            # 1. Ask OpenAI
-                            response = await client_openai.chat.completions.create(
-                                model="gpt-4o",
-                                messages=messages,
-                                tools=openai_tools,
-                                tool_choice="auto" 
-                            )
+                                messages.append({"role": "user", "content": user_input})
                             
-                            response_msg = response.choices[0].message
+                                # 1. Ask OpenAI (streamed, tool calls start as soon as they are complete)
+                                content, tool_calls, tasks = await stream_chat_turn(
+                                    mcp_client, messages, openai_tools
+                                )
                             
-                            # 2. Check for tool calls
-                            if response_msg.tool_calls:
-                                messages.append(response_msg)
-                                
-                                for tool_call in response_msg.tool_calls:
-                                    name = tool_call.function.name
-                                    args = json.loads(tool_call.function.arguments)
-                                    
-                                    print(f" > Executing tool: {name}...")
-                                    
-                                    try:
-                                        # 3. Execute tool on MCP Server
-                                        result = await mcp_client.call_tool(name, args)
-                                        output = result.content[0].text if result.content else "Success"
-                                    except Exception as e:
-                                        output = f"Error: {str(e)}"
-                                        
-                                    print(f" > Result: {output}")
-
+                                # 2. Check for tool calls
+                                if tool_calls:
                                     messages.append({
-                                        "tool_call_id": tool_call.id,
-                                        "role": "tool",
-                                        "name": name,
-                                        "content": str(output)
+                                        "role": "assistant",
+                                        "content": content,
+                                        "tool_calls": tool_calls
                                     })
+
+                                    # 3. Wait for the tool calls already running on the MCP Server
+                                    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+                                    # Format every result before touching the transcript, so each tool call gets its answer
+                                    formatted = [format_tool_output(result) for result in results]
+
+                                    # Tools whose output is already user-facing skip the summary round trip
+                                    direct_output = all(
+                                        tc["function"]["name"] in direct_tools and ok
+                                        for tc, (_, ok) in zip(tool_calls, formatted)
+                                    )
+
+                                    # Append results in the original order to keep the transcript deterministic
+                                    for tool_call, (output, _) in zip(tool_calls, formatted):
+                                        # Direct output is shown once below as the assistant reply
+                                        if not direct_output:
+                                            print(f" > Result: {output}")
+
+                                        messages.append({
+                                            "tool_call_id": tool_call["id"],
+                                            "role": "tool",
+                                            "name": tool_call["function"]["name"],
+                                            "content": str(output)
+                                        })
                                 
-                                # 4. Final response after tool execution
-                                final = await client_openai.chat.completions.create(
-                                    model="gpt-4o", messages=messages
-                                )
-                                final_text = final.choices[0].message.content
-                                print(f"\nAssistant: {final_text}")
-                                messages.append({"role": "assistant", "content": final_text})
+                                    # 4. Final response after tool execution
+                                    if direct_output:
+                                        final_text = "\n".join(output for output, _ in formatted)
+                                    else:
+                                        final = await client_openai.chat.completions.create(
+                                            model="gpt-4o", messages=messages
+                                        )
+                                        final_text = final.choices[0].message.content
+                                    print(f"\nAssistant: {final_text}")
+                                    messages.append({"role": "assistant", "content": final_text})
                                 
-                            else:
-                                print(f"\nAssistant: {response_msg.content}")
-                                messages.append(response_msg)
-                        except KeyboardInterrupt:
-                            return
-                        except Exception as e:
-                            print(f"Error: {e}")
-            # If we exit the context naturally, return
-            return
+                                else:
+                                    print(f"\nAssistant: {content}")
+                                    messages.append({"role": "assistant", "content": content})
+
+                                # 5. Compact old history in the background while the user types
+                                if len(messages) >= MAX_HISTORY:
+                                    compaction = asyncio.create_task(compact_history(messages))
+                            except (KeyboardInterrupt, EOFError):
+                                return
+                            except Exception as e:
+                                print(f"Error: {e}")
+                # If we exit the context naturally, return
+                return
             
-        except ClientNotFoundError:
-            print("! Client credentials rejected by server (likely server storage reset).")
-            print("! Clearing local cache and re-authenticating...")
+            except ClientNotFoundError:
+                print("! Client credentials rejected by server (likely server storage reset).")
+                print("! Clearing local cache and re-authenticating...")
             
-            # Close/Remove local storage to force new registration
-            if storage_dir.exists():
-                shutil.rmtree(str(storage_dir))
-                storage_dir.mkdir(parents=True, exist_ok=True)
+                # Close/Remove local storage to force new registration.
+                # The registration itself cannot be replayed: the server issues a new
+                # client_id on every DCR request, so the old credentials stay unknown to it.
+                if storage_dir.exists():
+                    await asyncio.to_thread(shutil.rmtree, str(storage_dir))
+                    await asyncio.to_thread(storage_dir.mkdir, parents=True, exist_ok=True)
             
-            if attempt == max_retries - 1:
-                print("x Failed to authenticate after cleaning cache.")
-                raise
+                if attempt == max_retries - 1:
+                    print("x Failed to authenticate after cleaning cache.")
+                    raise
+    finally:
+        # Retrieve the warm-up outcome even if the chat loop was never reached
+        warmup.cancel()
+        await asyncio.gather(warmup, return_exceptions=True)
+        # Release pooled connections held by the shared OpenAI HTTP client
+        await http_client.aclose()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="MCP Client")
     parser.add_argument("--profile", default="default", help="Client profile name for separate auth")
     args = parser.parse_args()
 
+    # uvloop is not available on Windows; fall back to the default event loop there
+    if sys.platform != "win32":
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
     try:
         asyncio.run(run_chat_loop(profile=args.profile))
     except KeyboardInterrupt:
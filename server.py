@@ -1,7 +1,10 @@
 # server.py (Optimized for Public/Enterprise Use)
 import os
+import sys
+import asyncio
 import logging
-from typing import Optional, Any, Dict
+from contextlib import asynccontextmanager
+from typing import Optional, Any, AsyncIterator, Callable, Dict, Tuple
 from datetime import datetime, timezone
 
 # FastMCP Framework
@@ -10,13 +13,15 @@ from fastmcp.tools.tool import Tool, ToolResult
 from fastmcp.server.dependencies import get_context
 from fastmcp.server.auth.providers.google import GoogleProvider
 from fastmcp.exceptions import ToolError
+from mcp.types import TextContent
 
 # Storage
 from key_value.aio.stores.redis import RedisStore
+from redis.asyncio import BlockingConnectionPool, Redis
 
-# Google SDK
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+# HTTP Client (Google Calendar REST API)
+import httpx
+import orjson
 
 # Environment Loading
 from dotenv import load_dotenv
@@ -42,6 +47,11 @@ SERVER_URL = os.environ.get("SERVER_URL", "http://localhost:8000")
 REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.environ.get("REDIS_PORT", "6379"))
 REDIS_DB = int(os.environ.get("REDIS_DB", "0"))
+REDIS_MAX_CONNECTIONS = int(os.environ.get("REDIS_MAX_CONNECTIONS", "64"))
+
+# Default expirations (seconds) for stored entries that are written without a TTL
+CLIENT_TTL = 90 * 24 * 3600         # Dynamically registered (DCR) clients
+DEFAULT_ENTRY_TTL = 30 * 24 * 3600  # Any other auth state FastMCP stores without a TTL
 
 if not all([GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET]):
     raise ValueError(
@@ -49,13 +59,51 @@ if not all([GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET]):
     )
 
 # --- Persistent Storage Layer ---
-# 1. Initialize Redis Connection (Shared Storage for Multi-Instance Support)
-# Tokens will be stored here.
-secure_store = RedisStore(
-    host=REDIS_HOST,
-    port=REDIS_PORT,
-    db=REDIS_DB,
-)
+class ExpiringRedisStore(RedisStore):
+    """
+    RedisStore that never writes an entry without an expiration, so dead tokens
+    and abandoned client registrations are evicted by Redis instead of piling up.
+    """
+
+    # FastMCP's OAuth proxy writes its tokens, codes and transactions with explicit
+    # TTLs; client registrations are the only entries it stores without one.
+    COLLECTION_TTLS: Dict[str, int] = {
+        "mcp-oauth-proxy-clients": CLIENT_TTL,
+    }
+
+    @classmethod
+    def default_ttl(cls, collection: Optional[str]) -> int:
+        return cls.COLLECTION_TTLS.get(collection or "", DEFAULT_ENTRY_TTL)
+
+    async def put(self, key: str, value: Any, *, collection: Optional[str] = None, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            ttl = self.default_ttl(collection)
+        await super().put(key, value, collection=collection, ttl=ttl)
+
+    async def put_many(self, keys: Any, values: Any, *, collection: Optional[str] = None, ttl: Optional[float] = None) -> None:
+        if ttl is None:
+            ttl = self.default_ttl(collection)
+        await super().put_many(keys, values, collection=collection, ttl=ttl)
+
+
+def create_secure_store(**pool_kwargs: Any) -> ExpiringRedisStore:
+    """
+    Builds the token store on a blocking connection pool, so concurrent requests
+    borrow pooled connections instead of queueing on a single one.
+    """
+    redis_pool = BlockingConnectionPool.from_url(
+        f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}",
+        max_connections=REDIS_MAX_CONNECTIONS,
+        # RedisStore only reads back str replies, like the client it builds itself
+        decode_responses=True,
+        **pool_kwargs,
+    )
+    return ExpiringRedisStore(client=Redis(connection_pool=redis_pool))
+
+
+# 1. Initialize Redis Connection Pool (Shared Storage for Multi-Instance Support)
+# Tokens will be stored here, namespaced by collection with per-collection expirations.
+secure_store = create_secure_store()
 
 # --- Authentication Provider Setup ---
 # We define the list of allowed redirect URIs.
@@ -76,17 +124,123 @@ auth_provider = GoogleProvider(
     extra_authorize_params={"access_type": "offline"}
 )
 
+# --- Google Calendar API Client ---
+# Shared async client (opened by the server lifespan) so outbound Calendar calls
+# never block the event loop and connections to Google are reused across sessions.
+CALENDAR_EVENTS_URL = "https://www.googleapis.com/calendar/v3/calendars/primary/events"
+
+
+def create_calendar_client() -> httpx.AsyncClient:
+    """Builds the Calendar API client; one is created for each server lifespan."""
+    return httpx.AsyncClient(
+        http2=True,
+        # Keep idle connections for minutes rather than httpx's default 5s, so the
+        # warmed connection is still pooled for the first tool call. If Google closes
+        # it earlier, httpx notices the dropped connection and simply reconnects.
+        limits=httpx.Limits(max_connections=200, keepalive_expiry=240.0),
+        timeout=httpx.Timeout(30.0, connect=10.0)
+    )
+
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+async def warm_google_connection() -> None:
+    """
+    Opens the DNS/TCP/TLS connection to the Calendar API ahead of the first tool call.
+    The unauthenticated request is rejected, but the connection stays in the keep-alive pool.
+    """
+    try:
+        await _client.head(CALENDAR_EVENTS_URL)
+    except httpx.HTTPError as e:
+        logger.warning("Google Calendar API warm-up failed: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """
+    Opens the shared Calendar API client for this run of the server, starts the
+    connection warm-up without delaying startup, and closes the client on shutdown.
+    FastMCP may enter the lifespan again in the same process, so each run gets a fresh client.
+    """
+    global _client
+    _client = create_calendar_client()
+    warmup_task = asyncio.create_task(warm_google_connection())
+    try:
+        yield
+    finally:
+        warmup_task.cancel()
+        await asyncio.gather(warmup_task, return_exceptions=True)
+        await _client.aclose()
+
+
 # --- Server Instantiation ---
 mcp = FastMCP(
     name="Google Calendar Professional",
     instructions="Enterprise-grade Google Calendar integration with persistent OAuth.",
-    auth=auth_provider
+    auth=auth_provider,
+    lifespan=lifespan
+)
+
+
+class GoogleApiError(Exception):
+    """A non-2xx Calendar API response, carrying Google's error message."""
+
+
+def raise_for_google_error(response: httpx.Response) -> None:
+    """
+    Raises GoogleApiError for error responses, keeping Google's own reason
+    (e.g. an invalid timeMin) so the model can correct its arguments.
+    """
+    if not response.is_error:
+        return
+    try:
+        message = orjson.loads(response.content).get("error", {}).get("message")
+    except (orjson.JSONDecodeError, AttributeError):
+        message = None
+    raise GoogleApiError(
+        f"{response.status_code} {response.reason_phrase}: {message or response.text or 'No details'}"
+    )
+
+
+# Access token retrieval strategies for the different FastMCP user object structures.
+# The first one that works is remembered so later requests skip the probing.
+_TOKEN_EXTRACTORS: Tuple[Callable[[Any], Optional[str]], ...] = (
+    lambda user: user.access_token.token,
+    lambda user: user.token,
 )
+_token_extractor: Optional[Callable[[Any], Optional[str]]] = None
 
 
-async def get_calendar_service(ctx: Context) -> Any:
+def extract_access_token(token_info: Any) -> Optional[str]:
     """
-    Reconstructs the Google Calendar Service object for the specific authenticated user.
+    Extracts the access token from the authenticated user object.
+    """
+    global _token_extractor
+
+    if _token_extractor is not None:
+        try:
+            access_token = _token_extractor(token_info)
+            if access_token:
+                return access_token
+        except AttributeError:
+            pass
+
+    # Unknown or changed object shape: probe every strategy again
+    for extractor in _TOKEN_EXTRACTORS:
+        try:
+            access_token = extractor(token_info)
+        except AttributeError:
+            continue
+        if access_token:
+            _token_extractor = extractor
+            return access_token
+    return None
+
+
+async def get_access_token(ctx: Context) -> str:
+    """
+    Retrieves the Google access token for the specific authenticated user.
     """
     try:
         req_ctx = ctx.request_context
@@ -103,39 +257,28 @@ async def get_calendar_service(ctx: Context) -> Any:
         token_info = request_obj.user
 
         # Access token retrieval logic (handles different FastMCP user object structures)
-        if hasattr(token_info, "access_token") and hasattr(token_info.access_token, "token"):
-            access_token = token_info.access_token.token
-        else:
-            access_token = getattr(token_info, "token", None)
+        access_token = extract_access_token(token_info)
 
         if not access_token:
             logger.error(
-                f"Token extraction failed. Object type: {type(token_info)}")
+                "Token extraction failed. Object type: %s", type(token_info))
             raise ToolError(
                 "Could not retrieve access token from user context.")
 
-        # Reconstruct Credentials
         # Note: The GoogleProvider manages refreshing the token automatically
         # if the client_storage is configured correctly.
-        creds = Credentials(
-            token=access_token,
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=GOOGLE_CLIENT_ID,
-            client_secret=GOOGLE_CLIENT_SECRET,
-            scopes=auth_provider.scopes if hasattr(auth_provider, "scopes") else [
-                "https://www.googleapis.com/auth/calendar.events"]
-        )
-
-        return build("calendar", "v3", credentials=creds, cache_discovery=False)
+        return access_token
 
     except Exception as e:
-        logger.error(f"Authorization/Service construction failed: {e}")
+        logger.error("Authorization failed: %s", e)
         raise ToolError(f"System Authorization Failure: {str(e)}")
 
 
 class ListUpcomingEvents(Tool):
     name: str = "list_upcoming_events"
     description: str = "List upcoming events from the primary calendar."
+    # Raw listings are summarized by the client's model before being shown
+    meta: Optional[Dict[str, Any]] = {"auto_summarize": True}
     parameters: Dict[str, Any] = {
         "type": "object",
         "description": "Get upcoming calendar events",
@@ -152,43 +295,48 @@ class ListUpcomingEvents(Tool):
 
         try:
             ctx = get_context()
-            service = await get_calendar_service(ctx)
-
-            # Use timezone-aware UTC now
-            now = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
-            t_min = time_min if time_min else now
-
-            logger.info(f"Fetching events for session {ctx.session_id}")
-            events_result = service.events().list(
-                calendarId='primary',
-                timeMin=t_min,
-                maxResults=max_results,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+            access_token = await get_access_token(ctx)
+
+            # Use timezone-aware UTC now, formatted directly as RFC 3339
+            t_min = time_min if time_min else f"{datetime.now(timezone.utc):%Y-%m-%dT%H:%M:%SZ}"
+
+            logger.info("Fetching events for session %s", ctx.session_id)
+            response = await _client.get(
+                CALENDAR_EVENTS_URL,
+                params={
+                    "timeMin": t_min,
+                    "maxResults": max_results,
+                    "singleEvents": "true",
+                    "orderBy": "startTime"
+                },
+                headers={"Authorization": f"Bearer {access_token}"}
+            )
+            raise_for_google_error(response)
+            events_result = orjson.loads(response.content)
 
             events = events_result.get('items', [])
 
             if not events:
-                return ToolResult(content=[{"type": "text", "text": "No upcoming events found."}])
+                return ToolResult(content=[TextContent(type="text", text="No upcoming events found.")])
 
-            result_lines = ["Upcoming events:"]
-            for event in events:
-                start = event['start'].get(
-                    'dateTime', event['start'].get('date'))
-                result_lines.append(
-                    f"- {start}: {event.get('summary', 'No Title')}")
+            text = "Upcoming events:\n" + "\n".join(
+                f"- {event['start'].get('dateTime', event['start'].get('date'))}: "
+                f"{event.get('summary', 'No Title')}"
+                for event in events
+            )
 
-            return ToolResult(content=[{"type": "text", "text": "\n".join(result_lines)}])
+            return ToolResult(content=[TextContent(type="text", text=text)])
 
         except Exception as e:
-            logger.error(f"API Error in list_events: {e}")
-            return ToolResult(content=[{"type": "text", "text": f"Google Calendar API Error: {str(e)}"}])
+            logger.error("API Error in list_events: %s", e)
+            return ToolResult(content=[TextContent(type="text", text=f"Google Calendar API Error: {str(e)}")])
 
 
 class CreateEvent(Tool):
     name: str = "create_event"
     description: str = "Create a new event in the primary calendar."
+    # The confirmation text is already user-facing, clients can show it as-is
+    meta: Optional[Dict[str, Any]] = {"auto_summarize": False}
     parameters: Dict[str, Any] = {
         "type": "object",
         "description": "Create a calendar event",
@@ -210,7 +358,7 @@ class CreateEvent(Tool):
 
         try:
             ctx = get_context()
-            service = await get_calendar_service(ctx)
+            access_token = await get_access_token(ctx)
 
             event_body = {
                 'summary': summary,
@@ -219,12 +367,21 @@ class CreateEvent(Tool):
                 'end': {'dateTime': end_time, 'timeZone': 'UTC'},
             }
 
-            event = service.events().insert(calendarId='primary', body=event_body).execute()
-            return ToolResult(content=[{"type": "text", "text": f"Event created successfully. Link: {event.get('htmlLink')}"}])
+            response = await _client.post(
+                CALENDAR_EVENTS_URL,
+                content=orjson.dumps(event_body),
+                headers={
+                    "Authorization": f"Bearer {access_token}",
+                    "Content-Type": "application/json"
+                }
+            )
+            raise_for_google_error(response)
+            event = orjson.loads(response.content)
+            return ToolResult(content=[TextContent(type="text", text=f"Event created successfully. Link: {event.get('htmlLink')}")])
         except Exception as e:
             logger.error(
-                f"Failed to create event for session {ctx.session_id}: {e}")
-            return ToolResult(content=[{"type": "text", "text": f"Failed to create event: {str(e)}"}])
+                "Failed to create event for session %s: %s", ctx.session_id, e)
+            return ToolResult(content=[TextContent(type="text", text=f"Failed to create event: {str(e)}")])
 
 
 # Add tools to server
@@ -232,6 +389,11 @@ mcp.add_tool(ListUpcomingEvents())
 mcp.add_tool(CreateEvent())
 
 if __name__ == "__main__":
-    logger.info(f"Starting Google Calendar MCP Server on {HOST}:{PORT}...")
+    # uvloop is not available on Windows; fall back to the default event loop there
+    if sys.platform != "win32":
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    logger.info("Starting Google Calendar MCP Server on %s:%s...", HOST, PORT)
     # Using '0.0.0.0' allows external access (Public Server)
     mcp.run(transport="sse", host=HOST, port=PORT)
@@ -0,0 +1,36 @@
+import asyncio
+import os
+
+import fakeredis
+from fakeredis.aioredis import FakeConnection
+
+os.environ.setdefault("GOOGLE_CLIENT_ID", "test-client-id")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "test-client-secret")
+
+import server  # noqa: E402
+
+
+def test_pooled_store_round_trip():
+    store = server.create_secure_store(
+        connection_class=FakeConnection,
+        server=fakeredis.FakeServer(),
+    )
+    value = {"client_id": "cid", "redirect_uris": ["http://localhost/callback"]}
+
+    async def round_trip():
+        await store.put("cid", value, collection="mcp-oauth-proxy-clients")
+        return await store.get("cid", collection="mcp-oauth-proxy-clients")
+
+    assert asyncio.run(round_trip()) == value
+
+
+def test_client_registrations_expire():
+    fake_server = fakeredis.FakeServer()
+    store = server.create_secure_store(connection_class=FakeConnection, server=fake_server)
+
+    async def put_and_ttl():
+        await store.put("cid", {"client_id": "cid"}, collection="mcp-oauth-proxy-clients")
+        return await store.ttl("cid", collection="mcp-oauth-proxy-clients")
+
+    _, ttl = asyncio.run(put_and_ttl())
+    assert 0 < ttl <= server.CLIENT_TTL
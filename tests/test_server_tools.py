@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+import httpx
+import pytest
+from fastmcp import Client
+
+os.environ.setdefault("GOOGLE_CLIENT_ID", "test-client-id")
+os.environ.setdefault("GOOGLE_CLIENT_SECRET", "test-client-secret")
+
+import server  # noqa: E402
+
+
+def test_google_error_message_is_kept():
+    response = httpx.Response(
+        400,
+        content=b'{"error": {"code": 400, "message": "Bad Request: invalid timeMin"}}',
+        request=httpx.Request("GET", server.CALENDAR_EVENTS_URL),
+    )
+
+    with pytest.raises(server.GoogleApiError, match="invalid timeMin"):
+        server.raise_for_google_error(response)
+
+
+async def no_warmup():
+    pass
+
+
+def test_tool_output_is_plain_text(monkeypatch):
+    # Entering the server lifespan must not reach out to Google
+    monkeypatch.setattr(server, "warm_google_connection", no_warmup)
+
+    async def call_create_event():
+        async with Client(server.mcp) as client:
+            return await client.call_tool(
+                "create_event",
+                {"summary": "Standup", "start_time": "2024-12-31T10:00:00Z", "end_time": "2024-12-31T10:15:00Z"},
+            )
+
+    # Unauthenticated in-memory calls fail, but the message must not be wrapped in JSON
+    result = asyncio.run(call_create_event())
+    assert result.content[0].text.startswith("Failed to create event:")
+
+
+def test_lifespan_can_run_again(monkeypatch):
+    monkeypatch.setattr(server, "warm_google_connection", no_warmup)
+
+    async def run_twice():
+        async with server.lifespan(server.mcp):
+            first = server._client
+        async with server.lifespan(server.mcp):
+            assert not server._client.is_closed
+        return first
+
+    first = asyncio.run(run_twice())
+    assert first.is_closed and server._client.is_closed